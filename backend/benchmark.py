@@ -0,0 +1,144 @@
+import argparse
+import gzip
+import json
+import statistics
+import time
+import tracemalloc
+
+import orjson
+import requests
+
+from corpus_store import ensure_corpus
+
+# ---------------- CONFIG ---------------- #
+API_URL = "http://127.0.0.1:8000/search"
+ITERATIONS = 200
+EMBED_BATCH_SIZES = [1, 8]
+LIVE_QUERIES = [
+    "I feel overwhelmed by pressure",
+    "What is the duty of a warrior?",
+    "anger leads to delusion",
+    "how do I stop worrying about results",
+]
+
+# ---------------- PAYLOADS ---------------- #
+
+def build_response(corpus, fields: str, limit: int = 20) -> dict:
+    """Builds a /search response shaped exactly like main.format_result, from real verses."""
+    results = []
+    for row in range(limit):
+        verse = corpus.get(row, ("sanskrit", "translation", "purport"))
+        if fields == "summary":
+            results.append({
+                "metadata": {
+                    "chapter": verse["chapter"],
+                    "verse": verse["verse"],
+                    "translation": verse["translation"],
+                },
+                "score": 1.0 - row * 0.01,
+            })
+        else:
+            results.append({
+                "text": verse["sanskrit"],
+                "metadata": {
+                    "chapter": verse["chapter"],
+                    "verse": verse["verse"],
+                    "text": verse["sanskrit"],
+                    "translation": verse["translation"],
+                    "meaning": verse["purport"],
+                },
+                "score": 1.0 - row * 0.01,
+            })
+    return {"results": results, "degraded": []}
+
+
+def cpu_time_us(fn, payload) -> float:
+    start = time.process_time()
+    for _ in range(ITERATIONS):
+        fn(payload)
+    return (time.process_time() - start) / ITERATIONS * 1e6
+
+# ---------------- BENCHMARKS ---------------- #
+
+def benchmark_serialization():
+    corpus = ensure_corpus()
+    print(f"{'field set':<10} {'bytes':>9} {'gzip':>9} {'json us':>9} {'orjson us':>10}")
+    for fields in ("full", "summary"):
+        payload = build_response(corpus, fields)
+        body = orjson.dumps(payload)
+        json_us = cpu_time_us(lambda p: json.dumps(p).encode("utf-8"), payload)
+        orjson_us = cpu_time_us(orjson.dumps, payload)
+        print(f"{fields:<10} {len(body):>9} {len(gzip.compress(body)):>9} {json_us:>9.1f} {orjson_us:>10.1f}")
+    corpus.close()
+
+
+def benchmark_live():
+    print(f"\nLive API: {API_URL}")
+    for fields in ("full", "summary"):
+        latencies, raw_sizes, wire_sizes = [], [], []
+        for query in LIVE_QUERIES:
+            start = time.perf_counter()
+            response = requests.post(
+                API_URL,
+                json={"query": query, "limit": 20, "fields": fields},
+                headers={"Accept-Encoding": "gzip"},
+                stream=True,
+            )
+            wire = response.raw.read(decode_content=False)
+            latencies.append((time.perf_counter() - start) * 1000)
+            wire_sizes.append(len(wire))
+            raw_sizes.append(len(gzip.decompress(wire)) if response.headers.get("content-encoding") == "gzip" else len(wire))
+        print(
+            f"{fields:<10} avg bytes {statistics.mean(raw_sizes):>9.0f} | "
+            f"on the wire {statistics.mean(wire_sizes):>8.0f} | "
+            f"median latency {statistics.median(latencies):.1f} ms"
+        )
+
+
+def benchmark_embedding():
+    """Latency and Python-side allocations of NumPy pooling vs the fused ONNX graph."""
+    import onnxruntime as ort
+    from huggingface_hub import hf_hub_download
+    from transformers import AutoTokenizer
+
+    from build_fused_embedder import (
+        MODEL_ID, OUTPUT_NAME, OUTPUT_PATH, SOURCE_FILE, numpy_embeddings, session_inputs,
+    )
+
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
+    reference = ort.InferenceSession(hf_hub_download(MODEL_ID, SOURCE_FILE), providers=["CPUExecutionProvider"])
+    fused = ort.InferenceSession(OUTPUT_PATH, providers=["CPUExecutionProvider"])
+    paths = {
+        "numpy": lambda inputs: numpy_embeddings(reference, session_inputs(reference, inputs)),
+        "fused": lambda inputs: fused.run([OUTPUT_NAME], session_inputs(fused, inputs))[0],
+    }
+
+    print(f"\n{'path':<6} {'batch':>5} {'median ms':>10} {'peak alloc KiB':>15}")
+    for batch_size in EMBED_BATCH_SIZES:
+        batch = [LIVE_QUERIES[i % len(LIVE_QUERIES)] for i in range(batch_size)]
+        inputs = tokenizer(batch, padding=True, truncation=True, return_tensors="np")
+        for name, run in paths.items():
+            run(inputs)  # Warm-up
+            latencies = []
+            for _ in range(ITERATIONS):
+                start = time.perf_counter()
+                run(inputs)
+                latencies.append((time.perf_counter() - start) * 1000)
+            tracemalloc.start()
+            run(inputs)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{name:<6} {batch_size:>5} {statistics.median(latencies):>10.2f} {peak / 1024:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure /search payloads, serialization and embedding cost.")
+    parser.add_argument("--live", action="store_true", help="Also measure a running API at API_URL")
+    parser.add_argument("--embed", action="store_true", help="Also compare NumPy vs fused ONNX embedding")
+    args = parser.parse_args()
+
+    benchmark_serialization()
+    if args.live:
+        benchmark_live()
+    if args.embed:
+        benchmark_embedding()
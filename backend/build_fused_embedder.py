@@ -0,0 +1,148 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import onnx
+import onnxruntime as ort
+from huggingface_hub import hf_hub_download
+from onnx import TensorProto, helper
+from transformers import AutoTokenizer
+
+# ---------------- CONFIG ---------------- #
+# MUST match EMBEDDING_MODEL / FUSED_EMBEDDING_PATH in main.py
+MODEL_ID = "Xenova/all-MiniLM-L6-v2"
+SOURCE_FILE = "onnx/model_quantized.onnx"
+OUTPUT_PATH = os.getenv("FUSED_EMBEDDING_PATH", "models/embedding_fused.onnx")
+OUTPUT_NAME = "sentence_embedding"
+PARITY_TOLERANCE = 1e-5
+
+PARITY_SENTENCES = [
+    "I feel overwhelmed by pressure",
+    "What is the duty of a warrior?",
+    "anger leads to delusion",
+    "how do I stop worrying about the results of my work when everyone depends on me",
+    "",
+]
+
+# ---------------- GRAPH SURGERY ---------------- #
+
+def _opset(model: onnx.ModelProto) -> int:
+    return next(o.version for o in model.opset_import if o.domain in ("", "ai.onnx"))
+
+
+def fuse_pooling(model: onnx.ModelProto) -> onnx.ModelProto:
+    """
+    Appends masked mean pooling and L2 normalization to the transformer graph, so the
+    session returns (batch, hidden) embeddings instead of (batch, seq_len, hidden) states.
+    Mirrors main.mean_pooling + the NumPy normalization, including the 1e-9 clamps.
+    """
+    graph = model.graph
+    hidden_state = graph.output[0].name  # last_hidden_state
+    opset = _opset(model)
+    nodes, initializers = [], []
+
+    def const(name, values, dtype=TensorProto.INT64):
+        initializers.append(helper.make_tensor(name, dtype, [len(values)], values))
+        return name
+
+    def reduce_sum(inp, out, axis, keepdims):
+        # ReduceSum takes axes as an input from opset 13, as an attribute before that
+        if opset >= 13:
+            return helper.make_node("ReduceSum", [inp, const(f"{out}_axes", [axis])], [out], keepdims=keepdims)
+        return helper.make_node("ReduceSum", [inp], [out], axes=[axis], keepdims=keepdims)
+
+    if opset >= 13:
+        unsqueeze = helper.make_node("Unsqueeze", ["pool_mask", const("pool_unsqueeze_axes", [-1])], ["pool_mask_3d"])
+    else:
+        unsqueeze = helper.make_node("Unsqueeze", ["pool_mask"], ["pool_mask_3d"], axes=[-1])
+    epsilon = const("pool_epsilon", [1e-9], TensorProto.FLOAT)
+
+    nodes += [
+        helper.make_node("Cast", ["attention_mask"], ["pool_mask"], to=TensorProto.FLOAT),
+        unsqueeze,
+        helper.make_node("Mul", [hidden_state, "pool_mask_3d"], ["pool_masked"]),
+        reduce_sum("pool_masked", "pool_summed", axis=1, keepdims=0),
+        reduce_sum("pool_mask_3d", "pool_counts", axis=1, keepdims=0),
+        helper.make_node("Max", ["pool_counts", epsilon], ["pool_counts_clipped"]),
+        helper.make_node("Div", ["pool_summed", "pool_counts_clipped"], ["pool_mean"]),
+        helper.make_node("Mul", ["pool_mean", "pool_mean"], ["pool_squared"]),
+        reduce_sum("pool_squared", "pool_sum_squares", axis=1, keepdims=1),
+        helper.make_node("Sqrt", ["pool_sum_squares"], ["pool_norm"]),
+        helper.make_node("Max", ["pool_norm", epsilon], ["pool_norm_clipped"]),
+        helper.make_node("Div", ["pool_mean", "pool_norm_clipped"], [OUTPUT_NAME]),
+    ]
+
+    graph.node.extend(nodes)
+    graph.initializer.extend(initializers)
+    del graph.output[:]
+    graph.output.append(helper.make_tensor_value_info(OUTPUT_NAME, TensorProto.FLOAT, ["batch_size", None]))
+    onnx.checker.check_model(model)
+    return model
+
+# ---------------- PARITY CHECK ---------------- #
+
+def numpy_embeddings(session: ort.InferenceSession, inputs: dict) -> np.ndarray:
+    """The reference path from main.encode_queries, run on the unfused model."""
+    hidden = session.run(None, inputs)[0]
+    mask = np.expand_dims(inputs["attention_mask"], axis=-1)
+    pooled = np.sum(hidden * mask, axis=1) / np.clip(np.sum(mask, axis=1), a_min=1e-9, a_max=None)
+    norm = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return pooled / np.clip(norm, a_min=1e-9, a_max=None)
+
+
+def session_inputs(session: ort.InferenceSession, encoded) -> dict:
+    return {i.name: encoded[i.name] for i in session.get_inputs()}
+
+
+def check_parity(source_path: str, fused_path: str, tokenizer) -> float:
+    """Returns the max absolute difference between the NumPy and fused embeddings."""
+    reference = ort.InferenceSession(source_path, providers=["CPUExecutionProvider"])
+    fused = ort.InferenceSession(fused_path, providers=["CPUExecutionProvider"])
+    worst = 0.0
+    # Single queries (the /search path) and one padded batch (the /search/batch path)
+    for batch in [[s] for s in PARITY_SENTENCES] + [PARITY_SENTENCES]:
+        encoded = tokenizer(batch, padding=True, truncation=True, return_tensors="np")
+        expected = numpy_embeddings(reference, session_inputs(reference, encoded))
+        actual = fused.run([OUTPUT_NAME], session_inputs(fused, encoded))[0]
+        worst = max(worst, float(np.max(np.abs(expected - actual))))
+    return worst
+
+
+def build(source_path: str, output_path: str = OUTPUT_PATH) -> float:
+    """Writes the fused model and returns its parity against the NumPy path; removes it on a mismatch."""
+    model = fuse_pooling(onnx.load(source_path))
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    onnx.save(model, output_path)
+
+    worst = check_parity(source_path, output_path, AutoTokenizer.from_pretrained(MODEL_ID))
+    if worst > PARITY_TOLERANCE:
+        os.remove(output_path)  # Never leave a divergent model where main.py would pick it up
+    return worst
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model with pooling + normalization fused in.")
+    parser.add_argument("--allow-fallback", action="store_true",
+                        help="Exit 0 without a fused model on failure; main.py then uses NumPy pooling")
+    args = parser.parse_args()
+
+    try:
+        print(f"Fetching {MODEL_ID}/{SOURCE_FILE}...")
+        source_path = hf_hub_download(MODEL_ID, SOURCE_FILE)
+        print("Fusing mean pooling + L2 normalization into the graph...")
+        worst = build(source_path)
+    except Exception as e:
+        if not args.allow_fallback:
+            raise
+        print(f"Fused export failed ({e}); serving will use NumPy pooling.")
+        sys.exit(0)
+
+    print(f"Parity check: max |numpy - fused| = {worst:.2e} (tolerance {PARITY_TOLERANCE:.0e})")
+    if worst > PARITY_TOLERANCE:
+        message = "Parity check failed; fused model removed."
+        if not args.allow_fallback:
+            sys.exit(message)
+        print(f"{message} Serving will use NumPy pooling.")
+    else:
+        print(f"Saved {OUTPUT_PATH}")
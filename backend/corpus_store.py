@@ -0,0 +1,173 @@
+import json
+import mmap
+import os
+import struct
+from typing import Iterator, Optional, Union
+
+import numpy as np
+
+# ---------------- CONFIG ---------------- #
+VERSES_FILE = "gita_full.json"
+EMOTIONS_FILE = "verse_emotions.json"
+CORPUS_FILE = "gita_corpus.bin"
+
+MAGIC = b"ANUGCRP1"
+HEADER = struct.Struct("<8sIII4x")  # magic, verse count, text field count, blob offset (padded to 24 bytes)
+NUM_CHAPTERS = 18
+
+# Variable-length fields, stored column by column as UTF-8 slices of one blob
+TEXT_FIELDS = ("verse_id", "sanskrit", "synonyms", "translation", "purport", "emotions")
+
+# ---------------- BUILDER ---------------- #
+
+def _align(buffer: bytearray, boundary: int = 8):
+    buffer.extend(b"\0" * (-len(buffer) % boundary))
+
+
+def build_corpus(verses_path: str = VERSES_FILE, emotions_path: str = EMOTIONS_FILE,
+                 out_path: str = CORPUS_FILE) -> int:
+    """
+    Builds the binary corpus artifact from the scraped verses and emotion tags.
+
+    Layout (little-endian, 8-byte aligned sections):
+      header | chapter u8[n] | verse u16[n] | chapter_offsets u32[19]
+             | text offsets u32[fields, n + 1] | UTF-8 blob
+    Rows are sorted by (chapter, verse), so the rows of chapter c are
+    chapter_offsets[c - 1]:chapter_offsets[c].
+    """
+    with open(verses_path, "r", encoding="utf-8") as f:
+        verses = json.load(f)
+
+    emotion_map = {}
+    if os.path.exists(emotions_path):
+        with open(emotions_path, "r", encoding="utf-8") as f:
+            emotion_map = json.load(f)
+
+    verses.sort(key=lambda v: (v["chapter"], v["verse"]))
+    count = len(verses)
+
+    chapters = np.array([v["chapter"] for v in verses], dtype=np.uint8)
+    verse_numbers = np.array([v["verse"] for v in verses], dtype=np.uint16)
+    chapter_offsets = np.searchsorted(chapters, np.arange(1, NUM_CHAPTERS + 2)).astype(np.uint32)
+
+    blob = bytearray()
+    text_offsets = np.zeros((len(TEXT_FIELDS), count + 1), dtype=np.uint32)
+    for f_idx, field in enumerate(TEXT_FIELDS):
+        for row, verse in enumerate(verses):
+            if field == "emotions":
+                value = emotion_map.get(verse["verse_id"], "")
+            else:
+                value = verse.get(field, "")
+            text_offsets[f_idx, row] = len(blob)
+            blob.extend(value.encode("utf-8"))
+        text_offsets[f_idx, count] = len(blob)
+
+    body = bytearray()
+    for array in (chapters, verse_numbers, chapter_offsets, text_offsets):
+        body.extend(array.tobytes())
+        _align(body)
+
+    # Per-process temp file: gunicorn workers may rebuild concurrently at startup
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, count, len(TEXT_FIELDS), HEADER.size + len(body)))
+        f.write(body)
+        f.write(blob)
+    os.replace(tmp_path, out_path)  # Atomic swap so running readers never see a partial file
+    return count
+
+
+def ensure_corpus(out_path: str = CORPUS_FILE, verses_path: str = VERSES_FILE,
+                  emotions_path: str = EMOTIONS_FILE) -> "CorpusStore":
+    """Opens the corpus artifact, (re)building it first if it is missing or older than its sources."""
+    sources = [p for p in (verses_path, emotions_path) if os.path.exists(p)]
+    if not os.path.exists(out_path) or any(
+        os.path.getmtime(p) > os.path.getmtime(out_path) for p in sources
+    ):
+        build_corpus(verses_path, emotions_path, out_path)
+    return CorpusStore(out_path)
+
+# ---------------- READER ---------------- #
+
+class CorpusStore:
+    """
+    Read-only, memory-mapped view over the corpus artifact.
+    Fixed-width columns are NumPy views on the mapping; text fields are decoded
+    only when a caller asks for them, so untouched purports never leave the page cache.
+    """
+
+    def __init__(self, path: str = CORPUS_FILE):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, n_fields, blob_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or n_fields != len(TEXT_FIELDS):
+            raise ValueError(f"{path} is not a compatible corpus file; rebuild it with corpus_store.py")
+
+        self.count = count
+        self._blob_offset = blob_offset
+
+        offset = HEADER.size
+        self.chapters, offset = self._view(np.uint8, count, offset)
+        self.verses, offset = self._view(np.uint16, count, offset)
+        self.chapter_offsets, offset = self._view(np.uint32, NUM_CHAPTERS + 1, offset)
+        text_offsets, offset = self._view(np.uint32, n_fields * (count + 1), offset)
+        self._text_offsets = text_offsets.reshape(n_fields, count + 1)
+        self._field_index = {field: i for i, field in enumerate(TEXT_FIELDS)}
+
+        self._rows = {
+            (int(c), int(v)): row for row, (c, v) in enumerate(zip(self.chapters, self.verses))
+        }
+
+    def _view(self, dtype, length: int, offset: int):
+        array = np.frombuffer(self._mm, dtype=dtype, count=length, offset=offset)
+        end = offset + array.nbytes
+        return array, end + (-end % 8)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def row_of(self, verse_key: str) -> Optional[int]:
+        """Resolves a verse_id ("2.47") or Pinecone vector ID ("c2v47") to a row number."""
+        try:
+            if verse_key.startswith("c") and "v" in verse_key:
+                chapter, verse = verse_key[1:].split("v", 1)
+            else:
+                chapter, verse = verse_key.split(".", 1)
+            return self._rows.get((int(chapter), int(verse)))
+        except ValueError:
+            return None
+
+    def chapter_rows(self, chapter: int) -> range:
+        return range(int(self.chapter_offsets[chapter - 1]), int(self.chapter_offsets[chapter]))
+
+    def text(self, row: int, field: str) -> str:
+        """Decodes a single text field of a single row straight from the mapping."""
+        f_idx = self._field_index[field]
+        start = self._blob_offset + int(self._text_offsets[f_idx, row])
+        end = self._blob_offset + int(self._text_offsets[f_idx, row + 1])
+        return self._mm[start:end].decode("utf-8")
+
+    def get(self, verse: Union[int, str], fields: tuple = TEXT_FIELDS) -> Optional[dict]:
+        """Returns chapter/verse plus the requested text fields for a row or verse key."""
+        row = verse if isinstance(verse, int) else self.row_of(verse)
+        if row is None:
+            return None
+        record = {"chapter": int(self.chapters[row]), "verse": int(self.verses[row])}
+        for field in fields:
+            record[field] = self.text(row, field)
+        return record
+
+    def iter_rows(self, fields: tuple = TEXT_FIELDS) -> Iterator[dict]:
+        for row in range(self.count):
+            yield self.get(row, fields)
+
+    def close(self):
+        self._text_offsets = self.chapters = self.verses = self.chapter_offsets = None
+        self._mm.close()
+        self._file.close()
+
+
+if __name__ == "__main__":
+    total = build_corpus()
+    print(f"Built {CORPUS_FILE} with {total} verses ({os.path.getsize(CORPUS_FILE)} bytes).")
@@ -1,4 +1,3 @@
-import json
 import os
 import numpy as np
 from transformers import AutoTokenizer
@@ -6,6 +5,9 @@ from optimum.onnxruntime import ORTModelForFeatureExtraction
 from pinecone import Pinecone
 from dotenv import load_dotenv
 
+from corpus_store import ensure_corpus
+from verse_graph import GRAPH_FILE, build_graph, embedding_text, save_graph
+
 # Load environment variables from .env
 load_dotenv()
 
@@ -39,19 +41,23 @@ def get_embedding(text):
     pooled_output = sum_embeddings / sum_mask
     return pooled_output[0].tolist()
 
-print("Loading Gita data...")
-with open("gita_full.json", "r", encoding="utf-8") as f:
-    verses = json.load(f)
+print("Loading Gita corpus...")
+corpus = ensure_corpus()
+verses = corpus.iter_rows(("verse_id", "sanskrit", "translation", "purport", "emotions"))
 
 print("Indexing verses to Pinecone...")
 batch_size = 100
 vectors = []
+all_embeddings = []
+all_emotions = []
 
 for i, verse in enumerate(verses):
-    text_to_embed = f"Chapter {verse['chapter']}, Verse {verse['verse']}: {verse['translation']} {verse.get('purport', '')}"
+    text_to_embed = embedding_text(verse)
     
     # Get 384-dim ONNX embedding
     embedding = get_embedding(text_to_embed)
+    all_embeddings.append(embedding)
+    all_emotions.append(verse['emotions'])
     
     # Same ID format as before so it overwrites smoothly
     vector_id = f"c{verse['chapter']}v{verse['verse']}"
@@ -79,4 +85,11 @@ if vectors:
     index.upsert(vectors=vectors)
     print("Final batch upserted.")
 
-print("Indexing complete! Pinecone is now synced with the new ONNX models.")
\ No newline at end of file
+print("Indexing complete! Pinecone is now synced with the new ONNX models.")
+
+# Precompute the related-verses graph from the same embeddings (rows follow corpus order).
+# Without a Pinecone re-index, `python verse_graph.py` builds the same graph on its own.
+print("Building related-verse graph...")
+neighbors, scores = build_graph(np.array(all_embeddings), all_emotions)
+save_graph(neighbors, scores, corpus.chapters, corpus.verses)
+print(f"Saved {GRAPH_FILE} ({neighbors.shape[0]} verses x {neighbors.shape[1]} neighbours).")
\ No newline at end of file
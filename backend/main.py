@@ -1,21 +1,28 @@
 import asyncio
+import functools
 import hashlib
-import json
 import os
-from typing import Optional, Any
-from contextlib import asynccontextmanager
+import random
+import secrets
+import time
+import uuid
+from typing import Annotated, Literal, Optional, Any
+from contextlib import asynccontextmanager, nullcontext
 from dotenv import load_dotenv
 
 import numpy as np
+import onnxruntime as ort
+import orjson
 import structlog
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 # Load environment variables first
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, Field, ValidationError
 from transformers import AutoTokenizer
 from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTModelForSequenceClassification
 from pinecone import Pinecone
@@ -27,9 +34,76 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
+from corpus_store import ensure_corpus
+from profiling import ProfileRing, SamplingProfiler, stage, stage_timings
+from query_recorder import QueryRecorder, popular_queries, trace_glob
+from sanskrit_index import SanskritIndex
+from verse_graph import load_graph
+
 # ---------------- CONFIGURATION ---------------- #
 EMBEDDING_MODEL = "Xenova/all-MiniLM-L6-v2"
 RERANK_MODEL = "Xenova/ms-marco-MiniLM-L-6-v2"
+# Performance: Embedding graph with pooling + normalization fused in (see build_fused_embedder.py)
+FUSED_EMBEDDING_PATH = os.getenv("FUSED_EMBEDDING_PATH", "models/embedding_fused.onnx")
+FUSED_EMBEDDING_OUTPUT = "sentence_embedding"
+
+# Performance: End-to-end request budget (overridable per request via `deadline_ms`)
+SEARCH_DEADLINE_MS = int(os.getenv("SEARCH_DEADLINE_MS", "8000"))
+# Minimum remaining budget a stage needs before it is attempted at all
+RERANK_MIN_BUDGET_MS = int(os.getenv("RERANK_MIN_BUDGET_MS", "300"))
+ADVICE_MIN_BUDGET_MS = int(os.getenv("ADVICE_MIN_BUDGET_MS", "1500"))
+# Kept back from retrieval so the stale-cache read still fits in the budget (at most a quarter of it)
+STALE_READ_RESERVE_MS = int(os.getenv("STALE_READ_RESERVE_MS", "250"))
+CACHE_TTL_SECONDS = 86400  # 24 hours
+STALE_CACHE_TTL_SECONDS = 7 * 86400  # Fallback copy served when the budget runs out
+
+# Performance: Batch search limits
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "16"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "64"))  # Pairs per cross-encoder run (bounds memory)
+
+# Performance: Warm-up run in lifespan before a worker accepts traffic
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() != "false"
+WARMUP_QUERY_TOKENS = (16, 32, 64, 128)  # Query lengths run through the embedder
+WARMUP_PASSAGE_TOKENS = (128, 256, 512)  # (query, verse) pair lengths run through the re-ranker
+WARMUP_BATCH_SIZES = (1, 8)  # Single /search and typical /search/batch embedding batches
+WARMUP_RERANK_PAIRS = (10, 40)  # Default limit * 2 and max limit * 2 candidates
+
+# Performance: Background refresh of the most popular recorded queries (needs RECORD_QUERIES=text traces)
+CACHE_REFRESH_TOP_N = int(os.getenv("CACHE_REFRESH_TOP_N", "0"))  # 0 = off
+CACHE_REFRESH_INTERVAL_SECONDS = int(os.getenv("CACHE_REFRESH_INTERVAL_SECONDS", "3600"))
+CACHE_REFRESH_WINDOW_SECONDS = int(os.getenv("CACHE_REFRESH_WINDOW_SECONDS", str(4 * 3600)))  # Refresh entries expiring sooner
+CACHE_REFRESH_QUERIES_PER_MINUTE = int(os.getenv("CACHE_REFRESH_QUERIES_PER_MINUTE", "30"))
+CACHE_REFRESH_BATCH_SIZE = 4
+CACHE_REFRESH_LOCK_KEY = "cache_refresh_lock"  # Held for one interval so only one gunicorn worker refreshes
+
+# Performance: Compress responses above this size (full 20-result responses carry every purport)
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+
+# Observability: Opt-in sampling profiler. Enabled when any trigger below is configured.
+# The header and sample triggers only sample while the chosen request runs.
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")  # Send as X-Profile-Token to profile one request
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # Fraction of requests captured at random
+# Capture every request slower than this (0 = off). Slowness is only known afterwards, so this keeps
+# the sampler running for the life of the process: every thread's stack is walked each
+# PROFILE_INTERVAL_MS, a cost every request pays.
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILED_PATHS = {"/search", "/search/batch"}
+
+# Observability: Query-traffic recorder for replay_traffic.py ("off", "hash" or "text")
+RECORD_QUERIES = os.getenv("RECORD_QUERIES", "off")  # "text" stores normalized query text; "hash" only its SHA-256
+RECORD_SAMPLE_RATE = float(os.getenv("RECORD_SAMPLE_RATE", "1.0"))
+RECORD_PATH = os.getenv("RECORD_PATH", "traffic/queries.jsonl")  # Each worker writes traffic/queries.<pid>.jsonl
+RECORD_MAX_BYTES = int(os.getenv("RECORD_MAX_BYTES", str(10 * 1024 * 1024)))
+RECORD_BACKUPS = int(os.getenv("RECORD_BACKUPS", "5"))
+
+# Security: Rate limits can only be switched off explicitly (e.g. for replaying traffic against a test build)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() != "false"
+
+# Search: Transliteration queries answered by the character-trigram index
+SANSKRIT_MIN_SCORE = 0.6  # Share of query trigrams a verse must contain to match
 
 # Security: Structured JSON Logger Setup
 structlog.configure(
@@ -65,10 +139,20 @@ redis = Redis(
 # ---------------- GLOBAL STATE ---------------- #
 # Initialize as None. They will be populated in lifespan.
 embedder: Optional[Any] = None
+fused_embedder: Optional[ort.InferenceSession] = None  # Replaces embedder + NumPy pooling when built
 reranker: Optional[Any] = None
 pc_index: Optional[Any] = None
 tokenizer_emb: Optional[Any] = None
 tokenizer_rerank: Optional[Any] = None
+corpus: Optional[Any] = None  # Memory-mapped verse store; metadata comes from Pinecone when missing
+verse_graph: Optional[Any] = None  # Precomputed related-verse graph (built by indexer.py)
+sanskrit_index: Optional[SanskritIndex] = None
+profiler: Optional[SamplingProfiler] = None
+profile_ring: Optional[ProfileRing] = None
+query_recorder: Optional[QueryRecorder] = None
+searches_in_flight = 0  # Overlap reported alongside profile captures
+cache_refresh_task: Optional[asyncio.Task] = None
+warmed_up = False  # Set once warm-up succeeds (or is disabled); gates /ready
 
 # ---------------- LIFESPAN MANAGER ---------------- #
 @asynccontextmanager
@@ -77,17 +161,27 @@ async def lifespan(app: FastAPI):
     Lifespan context manager handles startup and shutdown events.
     Models and DB connections are loaded here to prevent import-time blocking/crashes.
     """
-    global embedder, reranker, pc_index, tokenizer_emb, tokenizer_rerank
+    global embedder, fused_embedder, reranker, pc_index, tokenizer_emb, tokenizer_rerank, corpus, verse_graph
+    global profiler, profile_ring, sanskrit_index, query_recorder, cache_refresh_task, warmed_up
 
     logger.info("startup_begin")
 
-    # 1. Load Quantized Embedding Model
+    # 1. Load Quantized Embedding Model (the fused graph when built, otherwise the model + NumPy pooling)
+    if os.path.exists(FUSED_EMBEDDING_PATH):
+        try:
+            fused_embedder = ort.InferenceSession(FUSED_EMBEDDING_PATH, providers=["CPUExecutionProvider"])
+            logger.info("fused_embedding_model_loaded", path=FUSED_EMBEDDING_PATH)
+        except Exception as e:
+            logger.error("fused_embedding_model_load_failed", error=str(e))
+
     try:
         logger.info("loading_embedding_model", model=EMBEDDING_MODEL)
         tokenizer_emb = AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
-        embedder = ORTModelForFeatureExtraction.from_pretrained(
-            EMBEDDING_MODEL, subfolder="onnx", file_name="model_quantized.onnx"
-        )
+        # Performance: Only the fallback path needs the full model; loading both doubles per-worker memory
+        if not fused_embedder:
+            embedder = ORTModelForFeatureExtraction.from_pretrained(
+                EMBEDDING_MODEL, subfolder="onnx", file_name="model_quantized.onnx"
+            )
     except Exception as e:
         logger.error("embedding_model_load_failed", error=str(e))
 
@@ -101,7 +195,31 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error("reranker_load_failed", error=str(e))
 
-    # 3. Connect to Pinecone
+    # 3. Open the local corpus so matches can be hydrated without Pinecone metadata
+    try:
+        logger.info("loading_corpus")
+        corpus = await asyncio.to_thread(ensure_corpus)
+        logger.info("corpus_loaded", verses=len(corpus))
+
+        sanskrit_index = await asyncio.to_thread(SanskritIndex.from_corpus, corpus)
+        logger.info("sanskrit_index_built", trigrams=len(sanskrit_index.vocabulary))
+    except Exception as e:
+        logger.error("corpus_load_failed", error=str(e))
+
+    # 4. Load the related-verse graph, rejecting one built over a different corpus
+    try:
+        verse_graph = load_graph()
+        if verse_graph is None:
+            logger.warning("verse_graph_missing")
+        elif not corpus or not verse_graph.matches(corpus.chapters, corpus.verses):
+            logger.error("verse_graph_stale")
+            verse_graph = None
+        else:
+            logger.info("verse_graph_loaded", verses=len(verse_graph.neighbors))
+    except Exception as e:
+        logger.error("verse_graph_load_failed", error=str(e))
+
+    # 5. Connect to Pinecone
     try:
         logger.info("connecting_pinecone")
         pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
@@ -110,16 +228,62 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error("pinecone_connection_failed", error=str(e))
 
+    # 6. Start the sampling profiler only if a profiling trigger is configured
+    if PROFILE_ADMIN_TOKEN or PROFILE_SAMPLE_RATE > 0 or SLOW_REQUEST_MS > 0:
+        try:
+            profile_ring = ProfileRing(PROFILE_DIR, PROFILE_MAX_FILES)
+            profiler = SamplingProfiler(interval_ms=PROFILE_INTERVAL_MS, continuous=SLOW_REQUEST_MS > 0)
+            profiler.start()
+            logger.info("profiler_started", interval_ms=PROFILE_INTERVAL_MS, directory=PROFILE_DIR,
+                        continuous=profiler.continuous)
+        except Exception as e:
+            logger.error("profiler_start_failed", error=str(e))
+            profiler = None
+
+    # 7. Open the query-traffic recorder if enabled
+    if RECORD_QUERIES != "off":
+        try:
+            query_recorder = QueryRecorder(
+                RECORD_PATH, privacy=RECORD_QUERIES, sample_rate=RECORD_SAMPLE_RATE,
+                max_bytes=RECORD_MAX_BYTES, backups=RECORD_BACKUPS,
+            )
+            logger.info("query_recorder_started", path=query_recorder.path, privacy=RECORD_QUERIES)
+        except Exception as e:
+            logger.error("query_recorder_start_failed", error=str(e))
+
+    # 8. Warm up the ONNX sessions and corpus pages. The worker only starts accepting
+    # requests once this returns, so the first real requests run at steady-state latency.
+    warmed_up = not WARMUP_ENABLED
+    if WARMUP_ENABLED:
+        try:
+            started = time.perf_counter()
+            await asyncio.to_thread(warm_up)
+            warmed_up = True
+            logger.info("warmup_complete", elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+        except Exception as e:
+            logger.error("warmup_failed", error=str(e))
+
+    # 9. Keep popular queries cached in the background
+    if CACHE_REFRESH_TOP_N > 0:
+        cache_refresh_task = asyncio.create_task(refresh_popular_queries())
+        logger.info("cache_refresh_started", top_n=CACHE_REFRESH_TOP_N, interval=CACHE_REFRESH_INTERVAL_SECONDS)
+
     logger.info("startup_complete")
     
     yield  # Control is yielded to the application
     
     # Shutdown logic (if any cleanup is needed)
+    if cache_refresh_task:
+        cache_refresh_task.cancel()
+    if profiler:
+        profiler.stop()
+    if corpus:
+        corpus.close()
     logger.info("shutdown")
 
 # ---------------- INITIALIZATION ---------------- #
 # Security: Initialize Rate Limiter
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(key_func=get_remote_address, enabled=RATE_LIMIT_ENABLED)
 
 # Pass lifespan to FastAPI
 app = FastAPI(lifespan=lifespan)
@@ -140,15 +304,148 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Performance: Compress large JSON payloads
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES)
+
+# Observability: Stage timings and cache outcome for every search, plus recording and profiling when enabled
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    if request.url.path not in PROFILED_PATHS:
+        return await call_next(request)
+
+    global searches_in_flight
+
+    # Decide up front which requests to profile, so the sampler only runs while they do
+    requested = sampled = False
+    if profiler:
+        profile_token = request.headers.get("x-profile-token")
+        # Compare bytes: compare_digest raises TypeError on non-ASCII str (headers decode as latin-1)
+        requested = bool(PROFILE_ADMIN_TOKEN and profile_token and secrets.compare_digest(
+            profile_token.encode("utf-8"), PROFILE_ADMIN_TOKEN.encode("utf-8")
+        ))
+        sampled = not requested and random.random() < PROFILE_SAMPLE_RATE
+
+    timings = {}
+    token = stage_timings.set(timings)
+    searches_in_flight += 1
+    concurrent = searches_in_flight - 1
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        with profiler.window() if requested or sampled else nullcontext():
+            response = await call_next(request)
+    finally:
+        stage_timings.reset(token)
+        concurrent = max(concurrent, searches_in_flight - 1)
+        searches_in_flight -= 1
+    end = time.perf_counter()
+    elapsed_ms = (end - start) * 1000
+
+    # Endpoints leave per-query cache outcomes ("hit", "miss", "stale", "sanskrit") on request.state
+    cache = getattr(request.state, "cache", None)
+    if cache:
+        response.headers["X-Cache"] = ",".join(cache)
+
+    queries = getattr(request.state, "queries", None)
+    if query_recorder and queries:
+        try:
+            query_recorder.record(
+                started_at, request.url.path, queries, cache or [], elapsed_ms,
+                response.status_code, timings, getattr(request.state, "deadline_ms", None),
+            )
+        except Exception as e:
+            logger.error("query_record_failed", error=str(e))
+
+    if not profiler:
+        return response
+
+    slow = profiler.continuous and elapsed_ms >= SLOW_REQUEST_MS
+    if requested or sampled or slow:
+        now = time.time()  # IDs sort chronologically, which the ring relies on when trimming
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}{int(now * 1000) % 1000:03d}-{uuid.uuid4().hex[:8]}"
+        details = {
+            "path": request.url.path,
+            "status": response.status_code,
+            "latency_ms": round(elapsed_ms, 3),
+            "trigger": "header" if requested else "sample" if sampled else "slow",
+            # Samples cover every thread, so overlapping searches show up in the stacks too
+            "concurrent_requests": concurrent,
+            "stages_ms": timings,
+        }
+        folded = profiler.folded(start, end)
+        await asyncio.to_thread(profile_ring.save, profile_id, folded, details)
+        logger.info("request_profiled", profile_id=profile_id, **{k: v for k, v in details.items() if k != "stages_ms"})
+        if requested:
+            response.headers["X-Profile-Id"] = profile_id
+    return response
+
 # ---------------- DATA MODELS ---------------- #
-class SearchRequest(BaseModel):
+class SearchQuery(BaseModel):
     # Security: Input Validation (Max length and Range Bounds)
     query: str = Field(..., max_length=500)
     limit: int = Field(default=5, ge=1, le=20) # Max 20 results to prevent OOM
     chapter: Optional[int] = Field(default=None, ge=1, le=18) # Only 18 chapters exist
+    # "summary" returns chapter, verse, translation and score; "full" adds Sanskrit text and purport
+    fields: Literal["summary", "full"] = "full"
+    # "auto" answers Sanskrit/IAST queries from the trigram index and everything else semantically
+    mode: Literal["auto", "semantic", "sanskrit"] = "auto"
+
+class SearchRequest(SearchQuery):
+    deadline_ms: Optional[int] = Field(default=None, ge=100, le=30000) # Per-request time budget
+
+class RelatedVersesQuery(BaseModel):
+    limit: int = Field(default=5, ge=1, le=10)
+    diverse: bool = False  # Prefer verses from different chapters
+    fields: Literal["summary", "full"] = "summary"
+
+class BatchSearchRequest(BaseModel):
+    # Security: Bound the batch size so one call cannot monopolise a worker
+    queries: list[SearchQuery] = Field(..., min_length=1, max_length=BATCH_MAX_QUERIES)
+    deadline_ms: Optional[int] = Field(default=None, ge=100, le=30000) # Budget for the whole batch
+
+# ---------------- REQUEST DEADLINE ---------------- #
+class Deadline:
+    """Monotonic time budget shared by every stage of a single request."""
+
+    def __init__(self, budget_ms: int):
+        self.expires_at = time.monotonic() + budget_ms / 1000
+        # Capped so small budgets (deadline_ms >= 100) still leave retrieval most of the time
+        self.stale_reserve_ms = min(STALE_READ_RESERVE_MS, budget_ms // 4)
+
+    def remaining(self, reserve_ms: int = 0) -> float:
+        """Seconds left in the budget (never negative), minus `reserve_ms` held back for a later stage."""
+        return max(0.0, self.expires_at - time.monotonic() - reserve_ms / 1000)
+
+    def allows(self, min_budget_ms: int) -> bool:
+        """True if at least `min_budget_ms` remain for the next stage."""
+        return self.remaining() * 1000 >= min_budget_ms
+
+
+def _log_background_redis_error(future: asyncio.Future):
+    if not future.cancelled() and future.exception():
+        logger.error("redis_call_failed", error=str(future.exception()))
+
+
+async def bounded_redis(timeout: float, fn, *args, **kwargs):
+    """
+    Runs a blocking Upstash REST call in a worker thread and waits at most `timeout` seconds.
+    The call is always submitted; on timeout it finishes in the background (so cache writes
+    still land) and asyncio.TimeoutError is raised.
+    """
+    future = asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+    done, _ = await asyncio.wait([future], timeout=timeout)
+    if not done:
+        future.add_done_callback(_log_background_redis_error)
+        raise asyncio.TimeoutError
+    return future.result()
 
 # ---------------- HELPER FUNCTIONS ---------------- #
 
+def search_ready() -> bool:
+    """True once an embedding session, the re-ranker and Pinecone are all available."""
+    return bool(tokenizer_emb and (fused_embedder or embedder) and reranker and pc_index)
+
+
 def mean_pooling(model_output, attention_mask):
     """Apply mean pooling to token embeddings, weighted by attention mask."""
     token_embeddings = model_output[0]  # (batch, seq_len, hidden)
@@ -158,28 +455,181 @@ def mean_pooling(model_output, attention_mask):
     return summed / counts
 
 
+def encode_queries(texts: list[str]) -> np.ndarray:
+    """Encode query strings in one ONNX batch into normalized embeddings of shape (n, 384)."""
+    with stage("embed_tokenize"):
+        inputs = tokenizer_emb(texts, padding=True, truncation=True, return_tensors="np")
+
+    if fused_embedder:
+        # Performance: Pooling and normalization run inside ONNX Runtime; only (n, 384) comes back
+        with stage("embed_onnx"):
+            feed = {i.name: inputs[i.name] for i in fused_embedder.get_inputs()}
+            return fused_embedder.run([FUSED_EMBEDDING_OUTPUT], feed)[0]
+
+    with stage("embed_onnx"):
+        outputs = embedder(**inputs)
+    with stage("embed_pool"):
+        embeddings = mean_pooling(outputs, inputs["attention_mask"])
+        # L2 normalize
+        norm = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.clip(norm, a_min=1e-9, a_max=None)
+
+
 def encode_query(text: str) -> list[float]:
     """Encode a single query string into a normalized embedding vector."""
-    inputs = tokenizer_emb(text, padding=True, truncation=True, return_tensors="np")
-    outputs = embedder(**inputs)
-    embedding = mean_pooling(outputs, inputs["attention_mask"])
-    # L2 normalize
-    norm = np.linalg.norm(embedding, axis=1, keepdims=True)
-    embedding = embedding / np.clip(norm, a_min=1e-9, a_max=None)
-    return embedding[0].tolist()
+    return encode_queries([text])[0].tolist()
+
+
+def score_pairs(queries: list[str], texts: list[str]) -> list[float]:
+    """Score (query, text) pairs with the quantized cross-encoder in chunks of RERANK_BATCH_SIZE."""
+    scores = []
+    for start in range(0, len(texts), RERANK_BATCH_SIZE):
+        with stage("rerank_tokenize"):
+            inputs = tokenizer_rerank(
+                queries[start:start + RERANK_BATCH_SIZE], texts[start:start + RERANK_BATCH_SIZE],
+                padding=True, truncation=True, return_tensors="np",
+            )
+        with stage("rerank_onnx"):
+            outputs = reranker(**inputs)
+        logits = outputs.logits  # (batch, 1) or (batch, num_labels)
+        if logits.ndim == 2 and logits.shape[1] == 1:
+            scores.extend(logits[:, 0].tolist())
+        else:
+            scores.extend(logits.tolist())
+    return scores
 
 
 def rerank_pairs(query: str, texts: list[str]) -> list[float]:
     """Score query-text pairs using the quantized cross-encoder."""
-    inputs = tokenizer_rerank(
-        [query] * len(texts), texts,
-        padding=True, truncation=True, return_tensors="np",
-    )
-    outputs = reranker(**inputs)
-    logits = outputs.logits  # (batch, 1) or (batch, num_labels)
-    if logits.ndim == 2 and logits.shape[1] == 1:
-        return logits[:, 0].tolist()
-    return logits.tolist()
+    return score_pairs([query] * len(texts), texts)
+
+
+def query_cache_hash(payload: SearchQuery) -> str:
+    """Hash the normalized query together with the parameters that shape its results."""
+    normalized_query = payload.query.lower().strip()
+    key_source = f"{normalized_query}|{payload.limit}|{payload.chapter or ''}|{payload.fields}"
+    return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+
+def chapter_filter(chapter: Optional[int]) -> Optional[dict]:
+    return {"chapter": {"$eq": chapter}} if chapter else None
+
+
+CORPUS_FIELDS = ("sanskrit", "translation", "purport")
+
+def corpus_metadata(verse) -> Optional[dict]:
+    """Looks a verse (row, verse_id or vector ID) up in the local corpus, in Pinecone's metadata shape."""
+    # Performance: Read only the fields we need from the local memory-mapped corpus
+    record = corpus.get(verse, CORPUS_FIELDS)
+    if record is None:
+        return None
+    return {
+        "chapter": record["chapter"],
+        "verse": record["verse"],
+        "text": record["sanskrit"],
+        "translation": record["translation"],
+        "meaning": record["purport"],
+    }
+
+
+def format_matches(pc_results) -> list[dict]:
+    """Flatten Pinecone matches into the dicts consumed by the re-ranker."""
+    initial_results = []
+    for match in pc_results['matches']:
+        meta = match.get('metadata')
+        if not meta and corpus:
+            meta = corpus_metadata(match['id'])
+            if meta is None:
+                continue
+        meta = meta or {}
+        initial_results.append({
+            "id": match['id'],
+            "chapter": meta.get("chapter"),
+            "verse": meta.get("verse"),
+            "text": meta.get("text", ""),
+            "translation": meta.get("translation", ""),
+            "meaning": meta.get("meaning", ""),
+            "score": match['score']
+        })
+    return initial_results
+
+
+def rerank_text(item: dict) -> str:
+    return f"{item['translation']} {item['meaning']}"
+
+
+def order_results(initial_results: list[dict], cross_scores: Optional[list[float]]) -> list[dict]:
+    """Sort candidates by cross-encoder score, or keep vector order when re-ranking was skipped."""
+    if cross_scores is None:
+        return [{"score": float(item["score"]), "data": item} for item in initial_results]
+    scored_results = [
+        {"score": float(score), "data": initial_results[i]}
+        for i, score in enumerate(cross_scores)
+    ]
+    scored_results.sort(key=lambda x: x["score"], reverse=True)
+    return scored_results
+
+
+def format_result(item: dict, fields: str = "full") -> dict:
+    """Shape a scored candidate into the public response format for the requested field set."""
+    d = item["data"]
+    if fields == "summary":
+        return {
+            "metadata": {
+                "chapter": d.get("chapter"),
+                "verse": d.get("verse"),
+                "translation": d.get("translation", ""),
+            },
+            "score": item["score"]
+        }
+    return {
+        "text": d.get("text", ""),
+        "metadata": {
+            "chapter": d.get("chapter"),
+            "verse": d.get("verse"),
+            "text": d.get("text", ""),
+            "translation": d.get("translation", ""),
+            "meaning": d.get("meaning", ""),
+        },
+        "score": item["score"]
+    }
+
+
+def load_cached(cached_result):
+    return cached_result if isinstance(cached_result, dict) else orjson.loads(cached_result)
+
+
+def cached_bytes(cached_result) -> bytes:
+    """Cache entries are stored pre-serialized, so a hit is passed through without re-encoding."""
+    if isinstance(cached_result, dict):
+        return orjson.dumps(cached_result)
+    return cached_result.encode("utf-8") if isinstance(cached_result, str) else cached_result
+
+
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+def sanskrit_response(payload: SearchQuery) -> Optional[bytes]:
+    """Answers transliteration queries from the trigram index; None means use the neural pipeline."""
+    if payload.mode == "semantic":
+        return None
+    if not sanskrit_index:
+        if payload.mode == "sanskrit":
+            raise HTTPException(status_code=503, detail="Sanskrit search is initializing. Please try again in a few seconds.")
+        return None
+
+    with stage("sanskrit_lookup"):
+        rows = corpus.chapter_rows(payload.chapter) if payload.chapter else None
+        matches = sanskrit_index.search(payload.query, payload.limit, SANSKRIT_MIN_SCORE, rows)
+        if payload.mode == "auto" and not (matches and sanskrit_index.is_transliteration(payload.query)):
+            return None
+
+        results = [
+            format_result({"score": score, "data": corpus_metadata(row)}, payload.fields)
+            for row, score in matches
+        ]
+        return orjson.dumps({"results": results, "degraded": [], "mode": "sanskrit"})
 
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
@@ -217,85 +667,302 @@ async def generate_advice(query: str, verse_text: str):
         logger.error("llm_error", error=str(e))
         raise  # Re-raise so tenacity can retry
 
+async def vector_search(query: str, top_k: int, filter_dict: Optional[dict]):
+    """Embed the query and fetch the nearest verses from Pinecone."""
+    query_embedding = await asyncio.to_thread(encode_query, query)
+    with stage("pinecone"):
+        return await asyncio.to_thread(
+            pc_index.query,
+            vector=query_embedding,
+            top_k=top_k,
+            include_metadata=corpus is None,
+            filter=filter_dict
+        )
+
+
+async def rank_queries(queries: list[SearchQuery], deadline: Deadline) -> tuple[list[list[dict]], list[str]]:
+    """
+    Runs queries through one pipeline pass: one ONNX embedding batch, a concurrent Pinecone
+    fan-out and one batched cross-encoder run. Returns each query's top scored candidates
+    and the degradations applied; raises asyncio.TimeoutError if retrieval misses the deadline.
+    """
+    async def retrieve():
+        embeddings = await asyncio.to_thread(encode_queries, [q.query for q in queries])
+        with stage("pinecone"):
+            return await asyncio.gather(*[
+                asyncio.to_thread(
+                    pc_index.query,
+                    vector=embeddings[i].tolist(),
+                    top_k=q.limit * 2,
+                    include_metadata=corpus is None,
+                    filter=chapter_filter(q.chapter),
+                )
+                for i, q in enumerate(queries)
+            ])
+
+    pc_results = await asyncio.wait_for(retrieve(), timeout=deadline.remaining(deadline.stale_reserve_ms))
+    candidates = [format_matches(result) for result in pc_results]
+
+    # Re-rank every (query, verse) pair in one cross-encoder pass
+    pair_queries, pair_texts = [], []
+    for q, initial_results in zip(queries, candidates):
+        for item in initial_results:
+            pair_queries.append(q.query)
+            pair_texts.append(rerank_text(item))
+
+    all_scores = None
+    if pair_texts and deadline.allows(RERANK_MIN_BUDGET_MS):
+        try:
+            all_scores = await asyncio.wait_for(
+                asyncio.to_thread(score_pairs, pair_queries, pair_texts),
+                timeout=deadline.remaining(),
+            )
+        except asyncio.TimeoutError:
+            pass
+
+    degraded = []
+    if all_scores is None and pair_texts:
+        logger.warning("batch_rerank_skipped", queries=len(queries), remaining=deadline.remaining())
+        degraded.append("rerank_skipped")
+
+    # Split the scores back per query
+    ranked = []
+    offset = 0
+    for q, initial_results in zip(queries, candidates):
+        cross_scores = None
+        if all_scores is not None:
+            cross_scores = all_scores[offset:offset + len(initial_results)]
+        offset += len(initial_results)
+        ranked.append(order_results(initial_results, cross_scores)[:q.limit])
+    return ranked, degraded
+
+
+def cache_response(pipeline, query_hash: str, body: bytes):
+    """Queues the fresh and the stale-fallback copy of a response on a Redis pipeline."""
+    serialized = body.decode("utf-8")
+    pipeline.set(f"search_cache:{query_hash}", serialized, ex=CACHE_TTL_SECONDS)
+    pipeline.set(f"search_stale:{query_hash}", serialized, ex=STALE_CACHE_TTL_SECONDS)
+
+# ---------------- WARM-UP & CACHE REFRESH ---------------- #
+
+def warm_up():
+    """
+    Runs dummy batches through the ONNX sessions at the sequence lengths and batch sizes live
+    traffic uses, so per-shape allocations happen now instead of on the first real requests,
+    then touches every verse so the memory-mapped corpus pages are resident.
+    """
+    if tokenizer_emb and (fused_embedder or embedder):
+        for tokens in WARMUP_QUERY_TOKENS:
+            text = " ".join(["peace"] * tokens)
+            for batch_size in WARMUP_BATCH_SIZES:
+                encode_queries([text] * batch_size)
+
+    if tokenizer_rerank and reranker:
+        for tokens in WARMUP_PASSAGE_TOKENS:
+            passage = " ".join(["duty"] * tokens)
+            for pairs in WARMUP_RERANK_PAIRS:
+                score_pairs(["peace"] * pairs, [passage] * pairs)
+
+    if corpus:
+        for _ in corpus.iter_rows(CORPUS_FIELDS):
+            pass
+    if sanskrit_index:
+        sanskrit_index.search("dharma", 1, SANSKRIT_MIN_SCORE)
+
+
+async def refresh_cache_once():
+    """
+    Re-runs the CACHE_REFRESH_TOP_N most popular recorded queries whose cached response is
+    missing or expires within CACHE_REFRESH_WINDOW_SECONDS, at most
+    CACHE_REFRESH_QUERIES_PER_MINUTE so live traffic keeps priority.
+    """
+    if not search_ready():
+        return
+    # Only one gunicorn worker refreshes per interval. Redis calls run in worker threads so the
+    # REST round-trips never block requests sharing this event loop.
+    if not await asyncio.to_thread(
+        redis.set, CACHE_REFRESH_LOCK_KEY, str(os.getpid()), nx=True, ex=CACHE_REFRESH_INTERVAL_SECONDS
+    ):
+        return
+
+    candidates = []
+    for params in await asyncio.to_thread(popular_queries, trace_glob(RECORD_PATH), CACHE_REFRESH_TOP_N):
+        try:
+            query = SearchQuery(**params)
+        except ValidationError:
+            continue
+        # limit=1 responses carry AI advice, which is only generated on demand
+        if query.limit > 1:
+            candidates.append(query)
+    if not candidates:
+        logger.info("cache_refresh_skipped", reason="no_recorded_queries")
+        return
+
+    pipeline = redis.pipeline()
+    for query in candidates:
+        pipeline.ttl(f"search_cache:{query_cache_hash(query)}")
+    ttls = await asyncio.to_thread(pipeline.exec)
+    expiring = [q for q, ttl in zip(candidates, ttls) if ttl < CACHE_REFRESH_WINDOW_SECONDS]
+
+    refreshed = 0
+    for start in range(0, len(expiring), CACHE_REFRESH_BATCH_SIZE):
+        chunk = expiring[start:start + CACHE_REFRESH_BATCH_SIZE]
+        try:
+            ranked, degraded = await rank_queries(chunk, Deadline(SEARCH_DEADLINE_MS))
+        except asyncio.TimeoutError:
+            degraded = ["deadline_exceeded"]
+        # Never overwrite a good entry with a degraded one
+        if not degraded:
+            pipeline = redis.pipeline()
+            for query, top_results in zip(chunk, ranked):
+                body = orjson.dumps({
+                    "results": [format_result(item, query.fields) for item in top_results],
+                    "degraded": [],
+                })
+                cache_response(pipeline, query_cache_hash(query), body)
+            await asyncio.to_thread(pipeline.exec)
+            refreshed += len(chunk)
+        await asyncio.sleep(len(chunk) * 60 / CACHE_REFRESH_QUERIES_PER_MINUTE)
+
+    logger.info("cache_refreshed", candidates=len(candidates), expiring=len(expiring), refreshed=refreshed)
+
+
+async def refresh_popular_queries():
+    """Background loop started in lifespan; the first pass also warms Redis after a deploy."""
+    while True:
+        try:
+            await refresh_cache_once()
+        except Exception as e:
+            logger.error("cache_refresh_failed", error=str(e))
+        await asyncio.sleep(CACHE_REFRESH_INTERVAL_SECONDS)
+
 # ---------------- API ENDPOINTS ---------------- #
 
 @app.get("/")
 def home():
-    status = "Online" if embedder and pc_index else "Maintenance Mode (Models Loading)"
+    status = "Online" if search_ready() else "Maintenance Mode (Models Loading)"
     return {"message": "Anugamana API: Pinecone Search + Re-Ranking + RAG", "status": status}
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: the search services loaded and warm-up completed."""
+    if not search_ready() or not warmed_up:
+        raise HTTPException(status_code=503, detail="Search services are not ready.")
+    return {"status": "ready"}
+
+@app.get("/verses/{verse_id}/related")
+@limiter.limit("30/minute") # Security: Rate Limit applied
+async def related_verses(request: Request, verse_id: str, params: Annotated[RelatedVersesQuery, Query()]):
+    """Serves precomputed related verses from memory; accepts "2.47" or "c2v47" style IDs."""
+    if not corpus or not verse_graph:
+        raise HTTPException(status_code=503, detail="Related verses are not available yet.")
+
+    row = corpus.row_of(verse_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Verse not found.")
+
+    results = [
+        format_result({"score": score, "data": corpus_metadata(neighbor)}, params.fields)
+        for neighbor, score in verse_graph.related(row, params.limit, params.diverse)
+    ]
+    return json_response(orjson.dumps({
+        "verse": {"chapter": int(corpus.chapters[row]), "verse": int(corpus.verses[row])},
+        "results": results,
+    }))
+
 @app.post("/search")
 @limiter.limit("15/minute") # Security: Rate Limit applied
 async def search_verses(request: Request, payload: SearchRequest):
+    request.state.queries = [payload]
+    request.state.deadline_ms = payload.deadline_ms
+    request.state.cache = ["miss"]
+
+    # Performance: Transliteration queries never touch the neural pipeline
+    sanskrit_body = sanskrit_response(payload)
+    if sanskrit_body is not None:
+        logger.info("sanskrit_search", query=payload.query)
+        request.state.cache = ["sanskrit"]
+        return json_response(sanskrit_body)
+
     # Check if models are ready
-    if not embedder or not pc_index or not reranker:
+    if not search_ready():
         raise HTTPException(status_code=503, detail="Search services are initializing. Please try again in a few seconds.")
 
     try:
         # 1. Normalize and hash the query to create a unique Redis key
-        normalized_query = payload.query.lower().strip()
-        query_hash = hashlib.sha256(normalized_query.encode('utf-8')).hexdigest()
+        query_hash = query_cache_hash(payload)
         cache_key = f"search_cache:{query_hash}"
+        stale_key = f"search_stale:{query_hash}"
+        deadline = Deadline(payload.deadline_ms or SEARCH_DEADLINE_MS)
+        degraded = []
 
-        # 2. Check Redis for a cached response
+        # 2. Check Redis for a cached response; a lookup that outlasts the budget counts as a miss.
+        # No reserve is held back here: the stale read it would protect costs the same round-trip
         logger.info("checking_cache", query=payload.query)
-        cached_result = redis.get(cache_key)
+        try:
+            with stage("cache_lookup"):
+                cached_result = await bounded_redis(deadline.remaining(), redis.get, cache_key)
+        except asyncio.TimeoutError:
+            logger.warning("cache_lookup_timed_out", query=payload.query)
+            cached_result = None
 
         if cached_result:
             logger.info("cache_hit", query=payload.query)
-            return cached_result if isinstance(cached_result, dict) else json.loads(cached_result)
+            request.state.cache = ["hit"]
+            return json_response(cached_bytes(cached_result))
 
         logger.info("cache_miss", query=payload.query)
 
         # --- VECTOR SEARCH ---
         logger.info("searching_pinecone", query=payload.query)
 
-        # 3. Embed the query
-        query_embedding = await asyncio.to_thread(encode_query, payload.query)
-
-        # 4. Query Pinecone
+        # 3. Embed the query and 4. Query Pinecone, bounded by the request budget
         # We fetch limit * 2 to give the CrossEncoder re-ranker more options to evaluate
-        filter_dict = {"chapter": {"$eq": payload.chapter}} if payload.chapter else None
-        pc_results = await asyncio.to_thread(
-            pc_index.query,
-            vector=query_embedding,
-            top_k=payload.limit * 2,
-            include_metadata=True,
-            filter=filter_dict
-        )
+        try:
+            pc_results = await asyncio.wait_for(
+                vector_search(payload.query, payload.limit * 2, chapter_filter(payload.chapter)),
+                timeout=deadline.remaining(deadline.stale_reserve_ms),
+            )
+        except asyncio.TimeoutError:
+            # Performance: Out of budget before we have any candidates, fall back to stale cache
+            # within the reserved slice of the budget
+            try:
+                stale_result = await bounded_redis(deadline.remaining(), redis.get, stale_key)
+            except asyncio.TimeoutError:
+                stale_result = None
+            if not stale_result:
+                logger.warning("search_deadline_exceeded", query=payload.query)
+                raise HTTPException(status_code=504, detail="The search took too long. Please try again.")
+            logger.warning("serving_stale_cache", query=payload.query)
+            request.state.cache = ["stale"]
+            stale_response = load_cached(stale_result)
+            stale_response["degraded"] = ["stale_cache"]
+            return json_response(orjson.dumps(stale_response))
 
         # 5. Format results for the re-ranker
-        initial_results = []
-        for match in pc_results['matches']:
-            meta = match['metadata']
-            initial_results.append({
-                "id": match['id'],
-                "chapter": meta.get("chapter"),
-                "verse": meta.get("verse"),
-                "text": meta.get("text", ""),
-                "translation": meta.get("translation", ""),
-                "meaning": meta.get("meaning", ""),
-                "score": match['score']
-            })
+        initial_results = format_matches(pc_results)
 
         if not initial_results:
-            return {"results": []}
+            return json_response(orjson.dumps({"results": [], "degraded": degraded}))
 
         # --- RE-RANKING ---
-        rerank_texts = []
-        for item in initial_results:
-            rerank_texts.append(f"{item['translation']} {item['meaning']}")
-
-        cross_scores = await asyncio.to_thread(rerank_pairs, payload.query, rerank_texts)
+        rerank_texts = [rerank_text(item) for item in initial_results]
 
-        scored_results = []
-        for i, score in enumerate(cross_scores):
-            scored_results.append({
-                "score": float(score),
-                "data": initial_results[i]
-            })
+        cross_scores = None
+        if deadline.allows(RERANK_MIN_BUDGET_MS):
+            try:
+                cross_scores = await asyncio.wait_for(
+                    asyncio.to_thread(rerank_pairs, payload.query, rerank_texts),
+                    timeout=deadline.remaining(),
+                )
+            except asyncio.TimeoutError:
+                pass
 
-        scored_results.sort(key=lambda x: x["score"], reverse=True)
+        if cross_scores is None:
+            # Performance: Keep Pinecone's vector order when there is no time left to re-rank
+            logger.warning("rerank_skipped", query=payload.query, remaining=deadline.remaining())
+            degraded.append("rerank_skipped")
+        scored_results = order_results(initial_results, cross_scores)
 
         # Format final results
         final_results = []
@@ -304,44 +971,156 @@ async def search_verses(request: Request, payload: SearchRequest):
         rag_advice = None
         if top_results and payload.limit == 1:
             top_verse = top_results[0]
-            try:
-                rag_advice = await generate_advice(
-                    payload.query,
-                    f"{top_verse['data']['translation']} {top_verse['data']['meaning']}"
-                )
-            except Exception:
-                logger.warning("rag_advice_failed_after_retries")
-                rag_advice = None
+            if not deadline.allows(ADVICE_MIN_BUDGET_MS):
+                logger.warning("rag_advice_skipped", query=payload.query, remaining=deadline.remaining())
+                degraded.append("advice_skipped")
+            else:
+                try:
+                    # The timeout also cuts short any pending tenacity retries
+                    with stage("advice"):
+                        rag_advice = await asyncio.wait_for(
+                            generate_advice(payload.query, rerank_text(top_verse['data'])),
+                            timeout=deadline.remaining(),
+                        )
+                except asyncio.TimeoutError:
+                    logger.warning("rag_advice_timed_out", query=payload.query)
+                    degraded.append("advice_skipped")
+                except Exception:
+                    logger.warning("rag_advice_failed_after_retries")
+                    rag_advice = None
 
         for item in top_results:
-            d = item["data"]
-            res = {
-                "text": d.get("text", ""),
-                "metadata": {
-                    "chapter": d.get("chapter"),
-                    "verse": d.get("verse"),
-                    "text": d.get("text", ""),
-                    "translation": d.get("translation", ""),
-                    "meaning": d.get("meaning", ""),
-                },
-                "score": item["score"]
-            }
+            res = format_result(item, payload.fields)
             if rag_advice and item == top_results[0]:
                 res["metadata"]["ai_advice"] = rag_advice
 
             final_results.append(res)
 
         # 6. Construct final response and cache it
-        final_response = {"results": final_results}
+        final_response = {"results": final_results, "degraded": degraded}
 
-        logger.info("saving_to_cache", query=payload.query)
-        redis.set(cache_key, json.dumps(final_response), ex=86400)  # TTL: 24 hours
+        # Serialize once: the same bytes are cached and sent
+        with stage("serialize"):
+            body = orjson.dumps(final_response)
 
-        return final_response
+        # Degraded responses are served but never cached, so the next request gets the full pipeline
+        if not degraded:
+            logger.info("saving_to_cache", query=payload.query)
+            pipeline = redis.pipeline()
+            cache_response(pipeline, query_hash, body)
+            try:
+                with stage("cache_write"):
+                    await bounded_redis(deadline.remaining(), pipeline.exec)
+            except asyncio.TimeoutError:
+                logger.warning("cache_write_backgrounded", query=payload.query)
+
+        return json_response(body)
 
     except HTTPException:
         raise
     except Exception as e:
         # Security: Prevent Information Leakage
         logger.error("internal_search_error", error=str(e), exc_info=True)
-        raise HTTPException(status_code=500, detail="An internal error occurred while processing the search.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="An internal error occurred while processing the search.")
+
+@app.post("/search/batch")
+@limiter.limit("5/minute") # Security: Rate Limit applied (each call carries up to BATCH_MAX_QUERIES queries)
+async def search_verses_batch(request: Request, payload: BatchSearchRequest):
+    """
+    Runs many queries through one pipeline pass: a bulk cache MGET, one ONNX embedding
+    batch, a concurrent Pinecone fan-out and one batched cross-encoder run.
+    Results are returned in request order. AI advice is not generated for batch queries.
+    """
+    if not search_ready():
+        raise HTTPException(status_code=503, detail="Search services are initializing. Please try again in a few seconds.")
+
+    try:
+        queries = payload.queries
+        deadline = Deadline(payload.deadline_ms or SEARCH_DEADLINE_MS)
+        cache_outcomes = ["miss"] * len(queries)
+        request.state.queries = queries
+        request.state.deadline_ms = payload.deadline_ms
+        request.state.cache = cache_outcomes
+        query_hashes = [query_cache_hash(q) for q in queries]
+
+        # 1. Answer transliteration queries from the trigram index, then one bulk cache lookup for the rest.
+        # Each slot holds one query's serialized response; cache hits are passed through as-is
+        responses: list[Optional[bytes]] = [sanskrit_response(q) for q in queries]
+        pending = []
+        for i, response in enumerate(responses):
+            if response is None:
+                pending.append(i)
+            else:
+                cache_outcomes[i] = "sanskrit"
+        if pending:
+            try:
+                with stage("cache_lookup"):
+                    cached_results = await bounded_redis(
+                        deadline.remaining(),
+                        redis.mget, *[f"search_cache:{query_hashes[i]}" for i in pending],
+                    )
+            except asyncio.TimeoutError:
+                logger.warning("batch_cache_lookup_timed_out", queries=len(pending))
+                cached_results = [None] * len(pending)
+            for i, cached in zip(pending, cached_results):
+                if cached:
+                    responses[i] = cached_bytes(cached)
+                    cache_outcomes[i] = "hit"
+        misses = [i for i, response in enumerate(responses) if response is None]
+        logger.info("batch_cache_lookup", queries=len(pending), hits=len(pending) - len(misses))
+
+        def batch_response() -> Response:
+            return json_response(b'{"results":[' + b",".join(responses) + b"]}")
+
+        if not misses:
+            return batch_response()
+
+        # 2. Embed, retrieve and re-rank all misses in one pipeline pass
+        try:
+            ranked, degraded = await rank_queries([queries[i] for i in misses], deadline)
+        except asyncio.TimeoutError:
+            # Performance: Fall back to stale copies, leaving queries without one empty
+            logger.warning("batch_deadline_exceeded", queries=len(misses))
+            try:
+                stale_results = await bounded_redis(
+                    deadline.remaining(), redis.mget, *[f"search_stale:{query_hashes[i]}" for i in misses]
+                )
+            except asyncio.TimeoutError:
+                stale_results = [None] * len(misses)
+            for i, stale in zip(misses, stale_results):
+                if stale:
+                    responses[i] = orjson.dumps({**load_cached(stale), "degraded": ["stale_cache"]})
+                    cache_outcomes[i] = "stale"
+                else:
+                    responses[i] = orjson.dumps({"results": [], "degraded": ["deadline_exceeded"]})
+            return batch_response()
+
+        # 3. Serialize each response and cache the fresh ones in one pipeline.
+        # limit=1 responses are not cached: /search shares the key and serves them with AI advice
+        pipeline = redis.pipeline()
+        cacheable = 0
+        for i, top_results in zip(misses, ranked):
+            responses[i] = orjson.dumps({
+                "results": [format_result(item, queries[i].fields) for item in top_results],
+                "degraded": degraded,
+            })
+            if not degraded and queries[i].limit > 1:
+                cache_response(pipeline, query_hashes[i], responses[i])
+                cacheable += 1
+
+        if cacheable:
+            logger.info("saving_batch_to_cache", queries=cacheable)
+            try:
+                with stage("cache_write"):
+                    await bounded_redis(deadline.remaining(), pipeline.exec)
+            except asyncio.TimeoutError:
+                logger.warning("batch_cache_write_backgrounded", queries=cacheable)
+
+        return batch_response()
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Security: Prevent Information Leakage
+        logger.error("internal_batch_search_error", error=str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail="An internal error occurred while processing the search.")
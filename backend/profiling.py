@@ -0,0 +1,141 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# ---------------- STAGE TIMINGS ---------------- #
+# Per-request {stage: milliseconds}. Set by the middleware; asyncio.to_thread copies the
+# context, so stages timed inside worker threads land in the same dict.
+stage_timings: ContextVar[Optional[dict]] = ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Adds the wall time of the block to the current request's stage timings (no-op outside a request)."""
+    timings = stage_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(timings.get(name, 0.0) + (time.perf_counter() - start) * 1000, 3)
+
+# ---------------- SAMPLING PROFILER ---------------- #
+# Innermost frames of threads that are parked rather than working
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every thread (event loop and asyncio.to_thread workers)
+    at a fixed interval into a rolling time window. A request's profile is the set of
+    samples taken between its start and end; under concurrency it also contains the
+    work of overlapping requests.
+
+    With continuous=False the sampler thread stays parked until a `window()` is open,
+    so only the requests being profiled pay for sampling.
+    """
+
+    def __init__(self, interval_ms: float = 5, window_seconds: float = 60, continuous: bool = False):
+        self.interval = interval_ms / 1000
+        self.continuous = continuous
+        self._samples = deque(maxlen=int(window_seconds / self.interval))
+        self._stop = threading.Event()
+        self._sampling = threading.Event()
+        self._lock = threading.Lock()
+        self._open_windows = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.continuous:
+            self._sampling.set()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampling.set()  # Unpark the thread so it can exit
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    @contextmanager
+    def window(self):
+        """Samples while the block runs; windows may overlap."""
+        with self._lock:
+            self._open_windows += 1
+            self._sampling.set()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._open_windows -= 1
+                if not self._open_windows and not self.continuous:
+                    self._sampling.clear()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            self._sampling.wait()
+            if self._stop.wait(self.interval):
+                return
+            now = time.perf_counter()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._samples.append((now, ";".join(reversed(stack))))
+
+    def folded(self, start: float, end: float) -> Counter:
+        """Collapsed stacks ("root;...;leaf" -> count) sampled between two perf_counter times."""
+        return Counter(stack for ts, stack in list(self._samples) if start <= ts <= end)
+
+# ---------------- ON-DISK RING ---------------- #
+
+class ProfileRing:
+    """Keeps the newest `max_profiles` captures as <id>.folded (flamegraph input) + <id>.json (timings)."""
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, profile_id: str, folded: Counter, details: dict):
+        with self._lock:
+            with open(os.path.join(self.directory, f"{profile_id}.folded"), "w", encoding="utf-8") as f:
+                for stack, count in folded.most_common():
+                    f.write(f"{stack} {count}\n")
+            with open(os.path.join(self.directory, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+                json.dump(details, f, indent=2)
+            self._trim()
+
+    def _trim(self):
+        captures = sorted(
+            name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json")
+        )
+        for profile_id in captures[:-self.max_profiles]:
+            for suffix in (".folded", ".json"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + suffix))
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,116 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+# ---------------- CONFIG ---------------- #
+PRIVACY_MODES = ("hash", "text")  # "hash" never writes query text; "text" makes the trace replayable
+RETENTION_SECONDS = 7 * 86400  # Trace files of past workers untouched this long are deleted
+
+
+def worker_path(path: str, pid: int) -> str:
+    """Each worker process writes its own file: traffic/queries.jsonl -> traffic/queries.<pid>.jsonl."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{pid}{ext}"
+
+
+def trace_glob(path: str) -> str:
+    """Matches every worker's file for RECORD_PATH `path`, rotated backups included."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.*{ext}*"
+
+
+def normalize_query(query: str) -> str:
+    """Same normalization as the search cache key."""
+    return query.lower().strip()
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+class QueryRecorder:
+    """
+    Appends sampled search requests as JSON lines to a size-rotated file owned by this
+    process (see worker_path); RotatingFileHandler is not safe across processes, so
+    gunicorn workers never share one. Each line holds the endpoint, per-query parameters,
+    the query hash (and normalized text in "text" mode), cache outcomes, latency
+    and stage timings, which is everything replay_traffic.py needs.
+    """
+
+    def __init__(self, path: str, privacy: str = "hash", sample_rate: float = 1.0,
+                 max_bytes: int = 10 * 1024 * 1024, backups: int = 5):
+        if privacy not in PRIVACY_MODES:
+            raise ValueError(f"privacy must be one of {PRIVACY_MODES}, got {privacy!r}")
+        self.privacy = privacy
+        self.sample_rate = sample_rate
+        self.path = worker_path(path, os.getpid())
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._remove_expired(path)
+        handler = RotatingFileHandler(self.path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._log = logging.getLogger(f"query_recorder.{self.path}")
+        self._log.setLevel(logging.INFO)
+        self._log.propagate = False
+        self._log.handlers = [handler]
+
+    @staticmethod
+    def _remove_expired(path: str):
+        """Worker pids change on every restart, so files of past workers are aged out here."""
+        cutoff = time.time() - RETENTION_SECONDS
+        for old_path in glob.glob(trace_glob(path)):
+            try:
+                if os.path.getmtime(old_path) < cutoff:
+                    os.remove(old_path)
+            except FileNotFoundError:
+                pass  # Another worker removed it first
+
+    def describe_query(self, payload) -> dict:
+        """Per-query fields of a record; payload is a SearchQuery (or subclass)."""
+        entry = {"query_hash": query_hash(payload.query)}
+        if self.privacy == "text":
+            entry["query"] = normalize_query(payload.query)
+        entry.update(payload.model_dump(exclude={"query", "deadline_ms"}))
+        return entry
+
+    def record(self, started_at: float, endpoint: str, queries: list, cache: list[str],
+               latency_ms: float, status: int, stages_ms: dict, deadline_ms=None):
+        """Writes one request if it is sampled; started_at is the wall-clock arrival time used for replay."""
+        if random.random() >= self.sample_rate:
+            return
+        self._log.info(json.dumps({
+            "ts": round(started_at, 3),
+            "endpoint": endpoint,
+            "queries": [self.describe_query(q) for q in queries],
+            "deadline_ms": deadline_ms,
+            "cache": cache,
+            "status": status,
+            "latency_ms": round(latency_ms, 3),
+            "stages_ms": stages_ms,
+        }, ensure_ascii=False))
+
+
+def popular_queries(pattern: str, top_n: int) -> list[dict]:
+    """
+    The `top_n` most frequent query parameter sets across the trace files matching `pattern`.
+    Hash-only entries cannot be re-run and Sanskrit-index answers are never cached, so both are skipped.
+    """
+    counts = Counter()
+    for path in glob.glob(pattern):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # A line still being written
+                for entry, outcome in zip(record["queries"], record["cache"]):
+                    if "query" in entry and outcome != "sanskrit":
+                        params = {k: v for k, v in entry.items() if k != "query_hash"}
+                        counts[json.dumps(params, sort_keys=True)] += 1
+    return [json.loads(params) for params, _ in counts.most_common(top_n)]
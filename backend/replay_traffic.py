@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import glob
+import json
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+from query_recorder import trace_glob
+
+# ---------------- CONFIG ---------------- #
+API_BASE = "http://127.0.0.1:8000"
+TRACE_GLOB = trace_glob("traffic/queries.jsonl")  # Every worker's file, rotated backups included
+
+# ---------------- TRACE LOADING ---------------- #
+
+def load_trace(pattern: str) -> tuple[list[dict], int]:
+    """
+    Reads every rotated trace file matching `pattern`, ordered by arrival time.
+    Records written in "hash" privacy mode carry no query text and are skipped, as are
+    partially written lines.
+    """
+    records, skipped = [], 0
+    for path in glob.glob(pattern):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if all("query" in q for q in record["queries"]):
+                    records.append(record)
+                else:
+                    skipped += 1
+    records.sort(key=lambda r: r["ts"])
+    return records, skipped
+
+
+def request_body(record: dict) -> dict:
+    queries = [{k: v for k, v in q.items() if k != "query_hash"} for q in record["queries"]]
+    if record["endpoint"] == "/search/batch":
+        body = {"queries": queries}
+    else:
+        body = dict(queries[0])
+    if record.get("deadline_ms"):
+        body["deadline_ms"] = record["deadline_ms"]
+    return body
+
+# ---------------- REPLAY ---------------- #
+
+async def replay(records: list[dict], base_url: str, speed: float, concurrency: int) -> list[dict]:
+    """
+    Re-sends each record at its original offset from the first one, divided by `speed`
+    (speed=0 sends as fast as `concurrency` allows). The schedule depends only on the trace,
+    so two builds replayed from the same trace see the same workload.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    first_ts = records[0]["ts"]
+    results = []
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        started = time.perf_counter()
+
+        async def send(record: dict):
+            if speed > 0:
+                delay = (record["ts"] - first_ts) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            async with semaphore:
+                sent = time.perf_counter()
+                try:
+                    response = await client.post(record["endpoint"], json=request_body(record))
+                    status, cache = response.status_code, response.headers.get("x-cache", "")
+                except httpx.HTTPError:
+                    status, cache = 0, ""
+            results.append({
+                "endpoint": record["endpoint"],
+                "status": status,
+                "latency_ms": (time.perf_counter() - sent) * 1000,
+                "cache": [c for c in cache.split(",") if c],
+                "queries": len(record["queries"]),
+            })
+
+        await asyncio.gather(*[send(record) for record in records])
+    return results
+
+# ---------------- REPORT ---------------- #
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(results: list[dict]) -> dict:
+    outcomes = Counter(c for r in results for c in r["cache"])
+    summary = {
+        "requests": len(results),
+        "errors": sum(1 for r in results if r["status"] != 200),
+        "cache_outcomes": dict(outcomes),
+        "cache_hit_rate": round(outcomes["hit"] / max(1, sum(outcomes.values())), 4),
+        "endpoints": {},
+    }
+    for endpoint in sorted({r["endpoint"] for r in results}):
+        subset = [r for r in results if r["endpoint"] == endpoint]
+        latencies = [r["latency_ms"] for r in subset]
+        stats = {
+            "requests": len(subset),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+        }
+        if endpoint == "/search/batch":
+            # Batching efficiency: how many queries each call carried, and how many needed the pipeline
+            stats["queries_per_call"] = round(statistics.mean(r["queries"] for r in subset), 2)
+            stats["pipeline_queries_per_call"] = round(
+                statistics.mean(r["cache"].count("miss") for r in subset), 2
+            )
+        summary["endpoints"][endpoint] = stats
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded query trace against the API.")
+    parser.add_argument("--trace", default=TRACE_GLOB, help="Glob of trace files (rotated files included)")
+    parser.add_argument("--url", default=API_BASE, help="Base URL of the build under test")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Timing scale: 1 = original pacing, 2 = twice as fast, 0 = no pacing")
+    parser.add_argument("--concurrency", type=int, default=32, help="Max requests in flight")
+    parser.add_argument("--limit", type=int, default=0, help="Replay only the first N records")
+    parser.add_argument("--out", help="Write the JSON summary here to compare builds")
+    args = parser.parse_args()
+
+    records, skipped = load_trace(args.trace)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        raise SystemExit(f"No replayable records in {args.trace} ({skipped} hash-only or unreadable records skipped).")
+
+    print(f"Replaying {len(records)} requests at speed {args.speed} ({skipped} hash-only or unreadable records skipped)...")
+    summary = summarize(asyncio.run(replay(records, args.url, args.speed, args.concurrency)))
+    print(json.dumps(summary, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
@@ -0,0 +1,106 @@
+import re
+import unicodedata
+from typing import Optional
+
+import numpy as np
+
+# ---------------- CONFIG ---------------- #
+# Folds applied after diacritics are stripped, so ASCII spellings ("krishna", "gyaana")
+# and IAST ("kṛṣṇa", "jñāna") meet in the same form. Order matters: "sh" before "ri".
+ASCII_FOLDS = (("sh", "s"), ("ri", "r"), ("aa", "a"), ("ii", "i"), ("ee", "i"), ("uu", "u"), ("oo", "u"), ("w", "v"))
+MIN_WORD_LENGTH = 3  # Shorter words ("ca", "te", "na") are too ambiguous to route on
+ROUTE_WORD_SHARE = 0.6  # Share of query words that must be known Sanskrit words for auto routing
+MIN_ROUTE_WORDS = 2  # A single known word ("sad", "man" occur inside Sanskrit) is plain English too often
+
+_NON_LETTERS = re.compile(r"[^a-z\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def fold(text: str) -> str:
+    """Lowercases, strips diacritics and punctuation (compounds like "sthita-prajñā" are joined)."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    stripped = stripped.replace("-", "").replace("'", "")
+    stripped = _SPACES.sub(" ", _NON_LETTERS.sub(" ", stripped)).strip()
+    for source, target in ASCII_FOLDS:
+        stripped = stripped.replace(source, target)
+    return stripped
+
+
+def trigrams(folded: str) -> set:
+    """Character trigrams of each word, padded so word starts and ends carry weight."""
+    grams = set()
+    for word in folded.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def synonym_words(synonyms: str) -> str:
+    """Keeps the Sanskrit side of "word — meaning ; word — meaning" synonym lists."""
+    return " ".join(entry.split("—", 1)[0] for entry in synonyms.split(";") if "—" in entry)
+
+
+def has_diacritics(text: str) -> bool:
+    return any(unicodedata.combining(ch) for ch in unicodedata.normalize("NFKD", text))
+
+# ---------------- INDEX ---------------- #
+
+class SanskritIndex:
+    """
+    Trigram index over the `sanskrit` and `synonyms` fields of every verse.
+    Postings are stored CSR-style: trigram t owns rows[indptr[t]:indptr[t + 1]].
+    A query counts its trigrams per verse with one np.bincount and scores a verse by
+    the share of query trigrams it contains, which tolerates typos and spelling variants.
+    """
+
+    def __init__(self, documents: list[str]):
+        self.count = len(documents)
+        postings: dict[str, list[int]] = {}
+        self.words = set()
+        for row, document in enumerate(documents):
+            folded = fold(document)
+            self.words.update(w for w in folded.split() if len(w) >= MIN_WORD_LENGTH)
+            for gram in trigrams(folded):
+                postings.setdefault(gram, []).append(row)
+
+        self.vocabulary = {gram: i for i, gram in enumerate(postings)}
+        lengths = np.array([len(rows) for rows in postings.values()], dtype=np.int32)
+        self.indptr = np.concatenate(([0], np.cumsum(lengths))).astype(np.int32)
+        self.rows = np.fromiter(
+            (row for rows in postings.values() for row in rows), dtype=np.int16, count=int(self.indptr[-1])
+        )
+
+    @classmethod
+    def from_corpus(cls, corpus) -> "SanskritIndex":
+        documents = [
+            f"{record['sanskrit']} {synonym_words(record['synonyms'])}"
+            for record in corpus.iter_rows(("sanskrit", "synonyms"))
+        ]
+        return cls(documents)
+
+    def is_transliteration(self, query: str) -> bool:
+        """Heuristic for auto routing: IAST diacritics, or at least MIN_ROUTE_WORDS words that are mostly known Sanskrit."""
+        if has_diacritics(query):
+            return True
+        words = [w for w in fold(query).split() if len(w) >= MIN_WORD_LENGTH]
+        known = sum(w in self.words for w in words)
+        return known >= MIN_ROUTE_WORDS and known / len(words) >= ROUTE_WORD_SHARE
+
+    def search(self, query: str, limit: int, min_score: float,
+               rows: Optional[range] = None) -> list[tuple[int, float]]:
+        """Returns up to `limit` (row, score) pairs with score >= min_score, best first."""
+        query_grams = trigrams(fold(query))
+        gram_ids = [self.vocabulary[g] for g in query_grams if g in self.vocabulary]
+        if not gram_ids:
+            return []
+
+        hits = np.concatenate([self.rows[self.indptr[g]:self.indptr[g + 1]] for g in gram_ids])
+        scores = np.bincount(hits, minlength=self.count) / len(query_grams)
+        if rows is not None:
+            mask = np.zeros(self.count, dtype=bool)
+            mask[rows.start:rows.stop] = True
+            scores[~mask] = 0.0
+
+        top = np.argsort(-scores, kind="stable")[:limit]
+        return [(int(row), float(scores[row])) for row in top if scores[row] >= min_score]
@@ -4,6 +4,8 @@ import os
 import ollama
 from tqdm import tqdm
 
+from corpus_store import ensure_corpus
+
 # ---------------- CONFIG ---------------- #
 # Make sure you have pulled this model in your terminal first!
 # Run: "ollama pull gemma3"
@@ -12,13 +14,13 @@ MODEL_NAME = "gemma3:4b"
 def generate_emotions():
     print(f"--- STARTING LOCAL TAGGER (Ollama: {MODEL_NAME}) ---")
     
-    # 1. Load Verses
+    # 1. Load Verses (only the fields the tagger reads are decoded)
     try:
-        with open("gita_full.json", "r", encoding="utf-8") as f:
-            verses = json.load(f)
+        corpus = ensure_corpus()
     except FileNotFoundError:
         print("Error: gita_full.json not found.")
         return
+    verses = list(corpus.iter_rows(("verse_id", "translation", "purport")))
 
     # 2. Resume Capability (Load existing progress)
     if os.path.exists("verse_emotions.json"):
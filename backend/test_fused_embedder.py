@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+from huggingface_hub import hf_hub_download
+from transformers import AutoTokenizer
+
+from build_fused_embedder import (
+    MODEL_ID, OUTPUT_PATH, PARITY_SENTENCES, PARITY_TOLERANCE, SOURCE_FILE, build, check_parity,
+)
+
+# Parity of the fused embedding graph against the NumPy pooling path, on the real
+# Xenova/all-MiniLM-L6-v2 checkpoint. Run after changing build_fused_embedder.py:
+#   python test_fused_embedder.py             # fuses into a temp file
+#   python test_fused_embedder.py --existing  # checks the model main.py would load
+
+if __name__ == "__main__":
+    print(f"Fetching {MODEL_ID}/{SOURCE_FILE}...")
+    source_path = hf_hub_download(MODEL_ID, SOURCE_FILE)
+
+    if "--existing" in sys.argv:
+        fused_path = OUTPUT_PATH
+        worst = check_parity(source_path, fused_path, AutoTokenizer.from_pretrained(MODEL_ID))
+    else:
+        fused_path = os.path.join(tempfile.mkdtemp(), "embedding_fused.onnx")
+        worst = build(source_path, fused_path)
+
+    print(f"{len(PARITY_SENTENCES)} sentences (single + padded batch) through {fused_path}")
+    print(f"max |numpy - fused| = {worst:.2e} (tolerance {PARITY_TOLERANCE:.0e})")
+    if worst > PARITY_TOLERANCE:
+        sys.exit("❌ Fused embeddings diverge from the NumPy path.")
+    print("✅ Fused embeddings match the NumPy path.")
@@ -0,0 +1,45 @@
+import sys
+
+from corpus_store import ensure_corpus
+from sanskrit_index import SanskritIndex
+
+# ---------------- CONFIG ---------------- #
+# Everyday English (the app's main traffic) must stay on the semantic pipeline in "auto" mode,
+# including short words that also occur inside Sanskrit ("sad", "man")
+ENGLISH_QUERIES = [
+    "sad",
+    "hate",
+    "anger",
+    "fear",
+    "man",
+    "I am sad",
+    "I feel lost and confused about my duty",
+    "how do I stop worrying about results",
+    "what is the meaning of life",
+]
+
+# Transliterations that should be answered by the trigram index
+SANSKRIT_QUERIES = [
+    "karmaṇy evādhikāras te",
+    "karmany evadhikaras te",
+    "dharma-kshetre kuru-kshetre",
+    "sthita-prajñā",
+]
+
+
+def check_routing() -> bool:
+    index = SanskritIndex.from_corpus(ensure_corpus())
+    ok = True
+    for expected, queries in (("semantic", ENGLISH_QUERIES), ("sanskrit", SANSKRIT_QUERIES)):
+        for query in queries:
+            routed = "sanskrit" if index.is_transliteration(query) else "semantic"
+            status = "✅" if routed == expected else "❌"
+            ok &= routed == expected
+            print(f"{status} '{query}' -> {routed} (expected {expected})")
+    return ok
+
+
+if __name__ == "__main__":
+    if not check_routing():
+        sys.exit("Auto routing sent queries to the wrong search path.")
+    print("\nAuto routing OK.")
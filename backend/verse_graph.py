@@ -0,0 +1,141 @@
+from typing import Optional
+
+import numpy as np
+
+# ---------------- CONFIG ---------------- #
+GRAPH_FILE = "verse_graph.npz"
+GRAPH_NEIGHBORS = 20  # Neighbours kept per verse; enough headroom for chapter-diverse selection
+EMOTION_WEIGHT = 0.15  # Weight of shared emotion tags (Jaccard) relative to cosine similarity
+EMBEDDING_MODEL = "Xenova/all-MiniLM-L6-v2"  # MUST match main.py / indexer.py
+EMBED_BATCH_SIZE = 32
+
+# ---------------- BUILDER ---------------- #
+
+def embedding_text(verse: dict) -> str:
+    """The passage embedded for each verse; indexer.py embeds the same text for Pinecone."""
+    return f"Chapter {verse['chapter']}, Verse {verse['verse']}: {verse['translation']} {verse.get('purport', '')}"
+
+
+def embed_corpus(corpus, batch_size: int = EMBED_BATCH_SIZE) -> tuple[np.ndarray, list[str]]:
+    """Mean-pooled ONNX embeddings of every verse in corpus order, plus their raw emotion tags."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+    model = ORTModelForFeatureExtraction.from_pretrained(
+        EMBEDDING_MODEL, subfolder="onnx", file_name="model_quantized.onnx"
+    )
+    verses = list(corpus.iter_rows(("translation", "purport", "emotions")))
+    embeddings = []
+    for start in range(0, len(verses), batch_size):
+        batch = [embedding_text(v) for v in verses[start:start + batch_size]]
+        inputs = tokenizer(batch, padding=True, truncation=True, return_tensors="np")
+        hidden = model(**inputs).last_hidden_state
+        mask = np.expand_dims(inputs["attention_mask"], axis=-1).astype(np.float32)
+        embeddings.append(np.sum(hidden * mask, axis=1) / np.clip(np.sum(mask, axis=1), a_min=1e-9, a_max=None))
+    return np.concatenate(embeddings), [v["emotions"] for v in verses]
+
+
+def _emotion_tags(raw: str) -> set:
+    return {tag.strip().lower() for tag in raw.split(",") if tag.strip()}
+
+
+def build_graph(embeddings: np.ndarray, emotions: list[str], k: int = GRAPH_NEIGHBORS,
+                emotion_weight: float = EMOTION_WEIGHT) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the top-k most related verses for every verse.
+    Relatedness = cosine similarity of verse embeddings + emotion_weight * Jaccard overlap
+    of their emotion tags. Returns (neighbors int16 (n, k), scores float16 (n, k)), best first.
+    """
+    vectors = embeddings.astype(np.float32)
+    vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), a_min=1e-9, a_max=None)
+    similarity = vectors @ vectors.T
+
+    tag_sets = [_emotion_tags(raw) for raw in emotions]
+    vocabulary = {tag: i for i, tag in enumerate(sorted(set().union(*tag_sets)))}
+    if vocabulary:
+        tags = np.zeros((len(tag_sets), len(vocabulary)), dtype=np.float32)
+        for row, tag_set in enumerate(tag_sets):
+            tags[row, [vocabulary[tag] for tag in tag_set]] = 1.0
+        shared = tags @ tags.T
+        sizes = tags.sum(axis=1)
+        union = sizes[:, None] + sizes[None, :] - shared
+        similarity += emotion_weight * np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+
+    np.fill_diagonal(similarity, -np.inf)  # A verse is never related to itself
+    k = min(k, len(vectors) - 1)
+    top = np.argpartition(-similarity, k, axis=1)[:, :k]
+    top_scores = np.take_along_axis(similarity, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    neighbors = np.take_along_axis(top, order, axis=1)
+    scores = np.take_along_axis(top_scores, order, axis=1)
+    return neighbors.astype(np.int16), scores.astype(np.float16)
+
+
+def save_graph(neighbors: np.ndarray, scores: np.ndarray, chapters: np.ndarray,
+               verses: np.ndarray, path: str = GRAPH_FILE):
+    """Stores the graph with the (chapter, verse) of each row so a stale graph can be detected."""
+    np.savez(path, neighbors=neighbors, scores=scores,
+             chapters=np.asarray(chapters, dtype=np.uint8), verses=np.asarray(verses, dtype=np.uint16))
+
+# ---------------- READER ---------------- #
+
+class VerseGraph:
+    """In-memory nearest-neighbour graph; rows line up with CorpusStore rows."""
+
+    def __init__(self, path: str = GRAPH_FILE):
+        with np.load(path) as data:
+            self.neighbors = data["neighbors"]
+            self.scores = data["scores"]
+            self.chapters = data["chapters"]
+            self.verses = data["verses"]
+
+    def matches(self, chapters: np.ndarray, verses: np.ndarray) -> bool:
+        """True if the graph was built over the same verse ordering as the given corpus columns."""
+        return np.array_equal(self.chapters, chapters) and np.array_equal(self.verses, verses)
+
+    def related(self, row: int, limit: int, diverse_chapters: bool = False) -> list[tuple[int, float]]:
+        """
+        Returns up to `limit` (row, score) pairs, best first.
+        With diverse_chapters, the best neighbour of each distinct chapter is taken first,
+        then any remaining slots are filled in score order.
+        """
+        candidates = [(int(n), float(s)) for n, s in zip(self.neighbors[row], self.scores[row])]
+        if not diverse_chapters:
+            return candidates[:limit]
+
+        picked, seen_chapters = [], {int(self.chapters[row])}
+        for neighbor, score in candidates:
+            chapter = int(self.chapters[neighbor])
+            if chapter not in seen_chapters:
+                picked.append((neighbor, score))
+                seen_chapters.add(chapter)
+            if len(picked) == limit:
+                return picked
+
+        picked_rows = {neighbor for neighbor, _ in picked}
+        for neighbor, score in candidates:
+            if len(picked) == limit:
+                break
+            if neighbor not in picked_rows:
+                picked.append((neighbor, score))
+        picked.sort(key=lambda pair: pair[1], reverse=True)
+        return picked
+
+
+def load_graph(path: str = GRAPH_FILE) -> Optional[VerseGraph]:
+    try:
+        return VerseGraph(path)
+    except FileNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    from corpus_store import ensure_corpus
+
+    corpus = ensure_corpus()
+    print(f"Embedding {len(corpus)} verses with {EMBEDDING_MODEL}...")
+    embeddings, emotions = embed_corpus(corpus)
+    neighbors, scores = build_graph(embeddings, emotions)
+    save_graph(neighbors, scores, corpus.chapters, corpus.verses)
+    print(f"Saved {GRAPH_FILE} ({neighbors.shape[0]} verses x {neighbors.shape[1]} neighbours).")